@@ -5,6 +5,9 @@
 
 import sys
 import os
+import queue
+import threading
+import time
 from pathlib import Path
 from PySide6.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, 
                                QWidget, QLabel, QPushButton, QComboBox, QLineEdit, 
@@ -25,31 +28,162 @@ class CropWorker(QThread):
     status_updated = Signal(str)         # 状态信息
     finished_signal = Signal(bool, str)  # 成功状态, 消息
     
+    # 人脸检测器在模块加载时创建一次，所有任务共用，避免每次任务重新解析XML
+    _FACE_CASCADE = cv2.CascadeClassifier(
+        cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+    )
+    
     def __init__(self, input_path: str, output_path: str, config: Dict[str, Any]):
         super().__init__()
         self.input_path = input_path
         self.output_path = output_path
         self.config = config
         self.running = True
-        
-        # 加载人脸检测器
-        self.face_cascade = cv2.CascadeClassifier(
-            cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-        )
+        self._last_report = 0
+        
+        # 输出编码的fourcc只需计算一次
+        self._codec = config['output']['codec']
+        self._fourcc = cv2.VideoWriter_fourcc(*self._codec)
+        
+        # OpenCL可用时启用T-API，Haar级联检测可以在GPU上执行
+        self.use_opencl = cv2.ocl.haveOpenCL()
+        if self.use_opencl:
+            cv2.ocl.setUseOpenCL(True)
+        
+        # 有YuNet模型文件时优先使用DNN人脸检测器，否则回退到Haar级联
+        self.face_detector = None
+        model_path = config.get('face_detection', {}).get('yunet_model')
+        if model_path and os.path.exists(model_path) and hasattr(cv2, 'FaceDetectorYN'):
+            self.face_detector = cv2.FaceDetectorYN.create(model_path, '', (320, 320))
     
     def stop(self):
         """停止处理"""
         self.running = False
     
+    def _open_capture(self):
+        """打开输入视频，优先请求硬件解码，不支持时回退到软件解码"""
+        # VIDEO_ACCELERATION_ANY 由OpenCV自动选择设备，不能同时指定 CAP_PROP_HW_DEVICE
+        cap = cv2.VideoCapture(self.input_path, cv2.CAP_FFMPEG,
+                               [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY])
+        if not cap.isOpened():
+            cap = cv2.VideoCapture(self.input_path, cv2.CAP_FFMPEG)
+        
+        # 保持默认的BGR输出：关闭 CAP_PROP_CONVERT_RGB 后FFmpeg后端对yuv420p只返回Y平面，
+        # 色度数据丢失，无法再写出彩色视频；灰度图只在检测帧的缩小图上转换，开销很小
+        
+        # 只缓存1帧，减少内存占用和读取延迟（后端不支持时会被忽略）
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return cap
+    
+    def _open_writer(self, fps, frame_size):
+        """创建视频写入器，优先使用硬件编码，所选编码器不可用时回退到mp4v"""
+        out = cv2.VideoWriter(self.output_path, cv2.CAP_FFMPEG, self._fourcc, fps, frame_size,
+                              [cv2.VIDEOWRITER_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY])
+        if not out.isOpened() and self._codec != 'mp4v':
+            self.status_updated.emit(f"编码器 {self._codec} 不可用，改用 mp4v")
+            out = cv2.VideoWriter(self.output_path, cv2.CAP_FFMPEG, cv2.VideoWriter_fourcc(*'mp4v'), fps, frame_size)
+        return out
+    
+    def _report_progress(self, frame_count, total_frames):
+        """按约0.5%的粒度发送进度信号，避免频繁跨线程刷新界面"""
+        if frame_count - self._last_report >= max(1, total_frames // 200):
+            self._last_report = frame_count
+            self.progress_updated.emit(frame_count, total_frames)
+    
+    def _start_pipeline(self, cap, out, total_frames, frame_size):
+        """启动读取线程和写入线程，主线程只负责检测和裁剪"""
+        # 有界队列提供背压，内存占用保持恒定；
+        # 编码耗时波动较大（如关键帧），写入队列更深一些以免阻塞检测和裁剪
+        read_queue_size = 8
+        write_queue_size = 16
+        self._read_q = queue.Queue(maxsize=read_queue_size)
+        self._write_q = queue.Queue(maxsize=write_queue_size)
+        self._read_eof = False
+        self._write_error = None
+        self._stop_reading = threading.Event()
+        
+        # 预分配连续的输出缓冲区轮流使用：写入队列中最多 write_queue_size 帧，
+        # 写入线程手上还有1帧，因此多留2个即可保证缓冲区写完前不会被覆盖
+        width, height = frame_size
+        self._out_bufs = [np.empty((height, width, 3), dtype=np.uint8) for _ in range(write_queue_size + 2)]
+        self._out_index = 0
+        self._reader = threading.Thread(target=self._reader_loop, args=(cap, total_frames), daemon=True)
+        self._writer = threading.Thread(target=self._writer_loop, args=(out,), daemon=True)
+        self._reader.start()
+        self._writer.start()
+    
+    def _stop_pipeline(self):
+        """结束流水线：停止读取并排空读取队列，通知写入线程写完剩余帧"""
+        # 提前结束时（取消或写入失败）通知读取线程不再解码，
+        # 它最多阻塞在一次放入已满队列的操作上，取走剩余帧即可使其退出
+        self._stop_reading.set()
+        while self._reader.is_alive():
+            try:
+                self._read_q.get_nowait()
+            except queue.Empty:
+                self._reader.join(0.05)
+        self._write_q.put(None)
+        self._writer.join()
+    
+    def _read_batch(self, batch_size):
+        """取出读取队列中已就绪的帧（至少等待1帧，最多 batch_size 帧），读完时返回空列表"""
+        frames = []
+        while not self._read_eof and len(frames) < batch_size:
+            try:
+                frame = self._read_q.get(block=not frames)
+            except queue.Empty:
+                break
+            if frame is None:
+                self._read_eof = True
+            else:
+                frames.append(frame)
+        return frames
+    
+    def _write_frame(self, cropped_frame):
+        """将裁剪结果复制到预分配的连续缓冲区并交给写入线程"""
+        out_buf = self._out_bufs[self._out_index]
+        self._out_index = (self._out_index + 1) % len(self._out_bufs)
+        np.copyto(out_buf, cropped_frame)
+        self._write_q.put(out_buf)
+    
+    def _reader_loop(self, cap, total_frames):
+        """读取线程：解码视频帧，结束时放入None作为结束标记"""
+        frame_count = 0
+        while self.running and not self._stop_reading.is_set() and frame_count < total_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            self._read_q.put(frame)
+            frame_count += 1
+        self._read_q.put(None)
+    
+    def _writer_loop(self, out):
+        """写入线程：按顺序编码写入裁剪后的帧，收到None时退出"""
+        while True:
+            frame = self._write_q.get()
+            if frame is None:
+                break
+            if self._write_error is not None:
+                # 写入已失败，只取走剩余帧避免主线程阻塞
+                continue
+            try:
+                out.write(frame)
+            except Exception as e:
+                self._write_error = e
+                self._stop_reading.set()
+    
     def run(self):
         """执行裁剪任务"""
         try:
             # 打开视频文件
-            cap = cv2.VideoCapture(self.input_path, cv2.CAP_FFMPEG)
+            cap = self._open_capture()
             if not cap.isOpened():
                 self.finished_signal.emit(False, f"无法打开视频文件 {self.input_path}")
                 return
             
+            if cap.get(cv2.CAP_PROP_HW_ACCELERATION) != cv2.VIDEO_ACCELERATION_NONE:
+                self.status_updated.emit("已启用硬件解码")
+            
             # 获取视频信息
             original_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
             original_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
@@ -58,7 +192,7 @@ class CropWorker(QThread):
             
             self.status_updated.emit(f"输入视频: {original_width}x{original_height}, {fps:.2f} FPS, {total_frames} 帧")
             
-            # 计算输出尺寸 (9:16)
+            # 计算输出尺寸 (9:16)，高度与原视频一致，只在水平方向裁剪
             vertical_height = int(original_height)
             vertical_width = int(vertical_height * 9 / 16)
             
@@ -94,6 +228,57 @@ class CropWorker(QThread):
         except Exception as e:
             self.finished_signal.emit(False, f"裁剪过程中发生错误: {str(e)}")
     
+    def _run_loop(self, cap, fps, original_width, vertical_width, vertical_height,
+                  total_frames, compute_x) -> bool:
+        """
+        各裁剪模式共用的处理循环
+        
+        Args:
+            cap: 刚打开、尚未读取过的视频（不会再回到第0帧重新定位，
+                 需要重新处理时应重新打开视频，比在长H.264视频上seek更快）
+            compute_x: compute_x(frame, frame_count)，返回当前帧的裁剪起点
+        """
+        # 初始化视频写入器
+        out = self._open_writer(fps, (vertical_width, vertical_height))
+        
+        if not out.isOpened():
+            self.status_updated.emit("错误: 无法创建输出视频文件")
+            return False
+        
+        max_x = original_width - vertical_width
+        frame_count = 0
+        self.status_updated.emit("开始处理视频...")
+        
+        self._start_pipeline(cap, out, total_frames, (vertical_width, vertical_height))
+        
+        # 逐批处理已解码的帧以摊薄每帧的Python开销
+        batch_size = 32
+        
+        while self.running and self._write_error is None:
+            frames = self._read_batch(batch_size)
+            if not frames:
+                break
+            
+            for frame in frames:
+                try:
+                    # 裁剪当前帧（起点限制在有效范围内，宽度恒为 vertical_width）
+                    crop_x_start = min(max(0, int(compute_x(frame, frame_count))), max_x)
+                    self._write_frame(frame[:, crop_x_start:crop_x_start + vertical_width])
+                    frame_count += 1
+                    
+                except Exception as e:
+                    self.status_updated.emit(f"处理第{frame_count}帧时出错，跳过: {str(e)}")
+            
+            # 更新进度
+            self._report_progress(frame_count, total_frames)
+        
+        self._stop_pipeline()
+        out.release()
+        if self._write_error is not None:
+            self.status_updated.emit(f"错误: 写入视频失败: {str(self._write_error)}")
+            return False
+        return True
+    
     def _dynamic_face_crop(self, cap, original_width, original_height, fps, 
                           vertical_width, vertical_height, total_frames) -> bool:
         """动态人脸检测裁剪模式"""
@@ -101,92 +286,103 @@ class CropWorker(QThread):
         
         face_config = self.config['face_detection']
         
-        # 重置视频到开始位置
-        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-        
-        # 初始化视频写入器
-        fourcc = cv2.VideoWriter_fourcc(*self.config['output']['codec'])
-        out = cv2.VideoWriter(self.output_path, fourcc, fps, (vertical_width, vertical_height))
-        
-        if not out.isOpened():
-            self.status_updated.emit("错误: 无法创建输出视频文件")
-            return False
+        # 在缩小后的图像上检测人脸，检测结果再按比例还原到原始尺寸
+        detect_scale = min(1.0, face_config['detect_width'] / original_width)
+        detect_size = (int(original_width * detect_scale), int(original_height * detect_scale))
+        
+        # 竖屏裁剪只关心约占画面高度 1/10 到 1/2 的人脸，限制尺寸范围以减少金字塔层数
+        min_face = max(max(face_config['min_size']), original_height // 10)
+        max_face = max(min_face, original_height // 2)
+        min_size = (max(1, int(min_face * detect_scale)),) * 2
+        max_size = (int(max_face * detect_scale),) * 2
+        
+        # 预分配检测用的缩小图和灰度图缓冲区，避免每帧重新分配
+        small = np.empty((detect_size[1], detect_size[0], 3), dtype=np.uint8)
+        gray = np.empty((detect_size[1], detect_size[0]), dtype=np.uint8)
+        
+        if self.face_detector is not None:
+            self.face_detector.setInputSize(detect_size)
+            self.status_updated.emit("人脸检测器: YuNet")
+        elif self.use_opencl:
+            self.status_updated.emit("人脸检测器: Haar级联 (OpenCL)")
+        else:
+            self.status_updated.emit("人脸检测器: Haar级联")
         
         # 初始化跟踪变量
         current_x = (original_width - vertical_width) // 2
         face_detected = False
+        last_target_x = current_x
         face_count = 0
+        slow_detect_warned = False
         
-        frame_count = 0
-        self.status_updated.emit("开始处理视频...")
-        
-        while self.running and frame_count < total_frames:
-            ret, frame = cap.read()
-            if not ret:
-                break
+        def face_x(frame, frame_count):
+            nonlocal current_x, face_detected, last_target_x, face_count, slow_detect_warned
             
-            try:
-                # 每帧检测人脸
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                faces = self.face_cascade.detectMultiScale(
-                    gray, 
-                    scaleFactor=face_config['scale_factor'],
-                    minNeighbors=face_config['min_neighbors'],
-                    minSize=face_config['min_size']
-                )
+            # 每 detect_every 帧检测一次人脸
+            if frame_count % face_config['detect_every'] == 0:
+                detect_start = time.perf_counter()
+                if self.face_detector is not None:
+                    # YuNet直接处理BGR图像，每行前4列为人脸框 x, y, w, h
+                    cv2.resize(frame, detect_size, dst=small, interpolation=cv2.INTER_AREA)
+                    _, detections = self.face_detector.detect(small)
+                    faces = detections[:, :4] if detections is not None else ()
+                else:
+                    if self.use_opencl:
+                        # 通过UMat在GPU上缩放、转灰度，级联检测也走OpenCL路径
+                        usmall = cv2.resize(cv2.UMat(frame), detect_size, interpolation=cv2.INTER_AREA)
+                        detect_input = cv2.cvtColor(usmall, cv2.COLOR_BGR2GRAY)
+                    else:
+                        cv2.resize(frame, detect_size, dst=small, interpolation=cv2.INTER_AREA)
+                        cv2.cvtColor(small, cv2.COLOR_BGR2GRAY, dst=gray)
+                        detect_input = gray
+                    faces = type(self)._FACE_CASCADE.detectMultiScale(
+                        detect_input, 
+                        scaleFactor=face_config['scale_factor'],
+                        minNeighbors=face_config['min_neighbors'],
+                        minSize=min_size,
+                        maxSize=max_size
+                    )
+                
+                # OpenCV在检测期间会释放GIL，单次检测过慢时提示用户调整参数
+                detect_ms = (time.perf_counter() - detect_start) * 1000
+                if detect_ms > 100 and not slow_detect_warned:
+                    self.status_updated.emit(f"提示: 单帧人脸检测耗时 {detect_ms:.0f} ms，可增大检测间隔或减小检测宽度")
+                    slow_detect_warned = True
                 
                 if len(faces) > 0:
                     # 检测到人脸
-                    best_face = max(faces, key=lambda f: f[2] * f[3])
-                    x, y, w, h = best_face
+                    areas = faces[:, 2].astype(np.int32) * faces[:, 3].astype(np.int32)
+                    best_face = faces[int(np.argmax(areas))]
+                    x, y, w, h = (int(v / detect_scale) for v in best_face)
                     face_center_x = x + w // 2 + face_config['right_offset']
                     
                     if not face_detected:
                         self.status_updated.emit(f"检测到人脸，开始动态跟踪...")
                         face_detected = True
                     
-                    # 计算目标位置并平滑移动
-                    target_x = max(0, min(face_center_x - vertical_width // 2, original_width - vertical_width))
-                    smoothing_factor = 0.9
-                    current_x = int(smoothing_factor * current_x + (1 - smoothing_factor) * target_x)
+                    # 计算目标位置
+                    last_target_x = max(0, min(face_center_x - vertical_width // 2, original_width - vertical_width))
                     face_count += 1
-                else:
+                elif not face_detected:
                     # 未检测到人脸
-                    if not face_detected:
-                        current_x = (original_width - vertical_width) // 2
-                
-                # 裁剪当前帧
-                crop_x_start = int(current_x)
-                crop_x_end = min(crop_x_start + vertical_width, original_width)
-                
-                if crop_x_end - crop_x_start < vertical_width:
-                    crop_x_start = max(0, crop_x_end - vertical_width)
-                
-                cropped_frame = frame[:, crop_x_start:crop_x_end]
-                
-                # 确保尺寸正确
-                if cropped_frame.shape[1] != vertical_width or cropped_frame.shape[0] != vertical_height:
-                    cropped_frame = cv2.resize(cropped_frame, (vertical_width, vertical_height))
-                
-                out.write(cropped_frame)
-                frame_count += 1
-                
-                # 更新进度
-                if frame_count % 10 == 0:  # 每10帧更新一次进度
-                    self.progress_updated.emit(frame_count, total_frames)
-                    
-            except Exception as e:
-                self.status_updated.emit(f"处理第{frame_count}帧时出错，跳过: {str(e)}")
-                continue
+                    current_x = (original_width - vertical_width) // 2
+            
+            # 检测帧之间沿用最近一次的目标位置，每帧继续平滑移动（90%当前位置 + 10%目标位置，纯整数运算）
+            if face_detected:
+                current_x = (9 * current_x + last_target_x) // 10
+            
+            return current_x
         
-        out.release()
+        success = self._run_loop(cap, fps, original_width, vertical_width, vertical_height,
+                                 total_frames, face_x)
         
         if face_count > 0:
-            self.status_updated.emit(f"成功跟踪了 {face_count} 帧中的人脸")
+            # 只有检测帧会计数，检测帧之间沿用上次的结果
+            self.status_updated.emit(f"共 {face_count} 个检测帧检测到人脸 (每 {face_config['detect_every']} 帧检测一次)")
         else:
             self.status_updated.emit("未检测到人脸，使用中心裁剪")
         
-        return True
+        return success
     
     def _motion_tracking_crop(self, cap, original_width, original_height, fps,
                             vertical_width, vertical_height, total_frames) -> bool:
@@ -195,113 +391,62 @@ class CropWorker(QThread):
         
         motion_config = self.config['motion_tracking']
         
-        # 重置视频到开始位置
-        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-        
-        # 初始化视频写入器
-        fourcc = cv2.VideoWriter_fourcc(*self.config['output']['codec'])
-        out = cv2.VideoWriter(self.output_path, fourcc, fps, (vertical_width, vertical_height))
+        # 在缩小4倍的灰度图上做帧差，以运动区域的质心作为画面焦点
+        motion_size = (max(1, original_width // 4), max(1, original_height // 4))
+        motion_scale = original_width / motion_size[0]
+        update_interval = max(1, int(fps * motion_config['update_interval']))
+        self.status_updated.emit(f"运动跟踪: 每 {update_interval} 帧更新焦点")
         
-        if not out.isOpened():
-            self.status_updated.emit("错误: 无法创建输出视频文件")
-            return False
+        # 预分配缓冲区（灰度图前后帧交替使用），避免每帧重新分配
+        small = np.empty((motion_size[1], motion_size[0], 3), dtype=np.uint8)
+        gray_bufs = [np.empty((motion_size[1], motion_size[0]), dtype=np.uint8) for _ in range(2)]
+        gray_index = 0
+        diff = np.empty_like(gray_bufs[0])
         
-        # 运动跟踪逻辑（简化版）
         prev_gray = None
         smoothed_x = (original_width - vertical_width) // 2
+        target_x = smoothed_x
         
-        frame_count = 0
-        self.status_updated.emit("开始处理视频...")
-        
-        while self.running and frame_count < total_frames:
-            ret, frame = cap.read()
-            if not ret:
-                break
+        def motion_x(frame, frame_count):
+            nonlocal prev_gray, gray_index, smoothed_x, target_x
             
-            try:
-                # 运动跟踪逻辑
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            # 每 update_interval 帧更新一次运动焦点
+            if frame_count % update_interval == 0:
+                cv2.resize(frame, motion_size, dst=small, interpolation=cv2.INTER_AREA)
+                gray = gray_bufs[gray_index]
+                cv2.cvtColor(small, cv2.COLOR_BGR2GRAY, dst=gray)
                 
                 if prev_gray is not None:
-                    # 计算光流
-                    flow = cv2.calcOpticalFlowFarneback(
-                        prev_gray, gray, None, 0.5, 3, 15, 3, 5, 1.2, 0
-                    )
+                    cv2.absdiff(prev_gray, gray, dst=diff)
+                    cv2.threshold(diff, motion_config['diff_threshold'], 255, cv2.THRESH_BINARY, dst=diff)
+                    moments = cv2.moments(diff, binaryImage=True)
                     
-                    # 简化运动跟踪：使用中心位置
-                    # 在实际应用中可以实现更复杂的运动跟踪逻辑
-                    pass
+                    if moments['m00'] > 0:
+                        focus_x = int(moments['m10'] / moments['m00'] * motion_scale)
+                        target_x = max(0, min(focus_x - vertical_width // 2, original_width - vertical_width))
                 
                 prev_gray = gray
-                
-                # 使用中心裁剪（简化版）
-                x_start = (original_width - vertical_width) // 2
-                cropped_frame = frame[:, x_start:x_start+vertical_width]
-                
-                # 确保尺寸正确
-                if cropped_frame.shape[1] != vertical_width or cropped_frame.shape[0] != vertical_height:
-                    cropped_frame = cv2.resize(cropped_frame, (vertical_width, vertical_height))
-                
-                out.write(cropped_frame)
-                frame_count += 1
-                
-                # 更新进度
-                if frame_count % 10 == 0:
-                    self.progress_updated.emit(frame_count, total_frames)
-                    
-            except Exception as e:
-                self.status_updated.emit(f"处理第{frame_count}帧时出错，跳过: {str(e)}")
-                continue
+                gray_index ^= 1
+            
+            # 每帧向目标位置平滑移动
+            smoothing = motion_config['smoothing_factor']
+            smoothed_x = int(smoothing * smoothed_x + (1 - smoothing) * target_x)
+            
+            return smoothed_x
         
-        out.release()
-        return True
+        return self._run_loop(cap, fps, original_width, vertical_width, vertical_height,
+                              total_frames, motion_x)
     
     def _center_crop(self, cap, original_width, original_height, fps,
                     vertical_width, vertical_height, total_frames) -> bool:
         """中心裁剪模式"""
         self.status_updated.emit("使用中心裁剪模式...")
         
-        # 重置视频到开始位置
-        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-        
-        # 初始化视频写入器
-        fourcc = cv2.VideoWriter_fourcc(*self.config['output']['codec'])
-        out = cv2.VideoWriter(self.output_path, fourcc, fps, (vertical_width, vertical_height))
-        
-        if not out.isOpened():
-            self.status_updated.emit("错误: 无法创建输出视频文件")
-            return False
-        
-        frame_count = 0
-        self.status_updated.emit("开始处理视频...")
-        
-        while self.running and frame_count < total_frames:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            try:
-                # 中心裁剪
-                x_start = (original_width - vertical_width) // 2
-                cropped_frame = frame[:, x_start:x_start+vertical_width]
-                
-                # 确保尺寸正确
-                if cropped_frame.shape[1] != vertical_width or cropped_frame.shape[0] != vertical_height:
-                    cropped_frame = cv2.resize(cropped_frame, (vertical_width, vertical_height))
-                
-                out.write(cropped_frame)
-                frame_count += 1
-                
-                # 更新进度
-                if frame_count % 10 == 0:
-                    self.progress_updated.emit(frame_count, total_frames)
-                    
-            except Exception as e:
-                self.status_updated.emit(f"处理第{frame_count}帧时出错，跳过: {str(e)}")
-                continue
+        # 裁剪位置固定
+        x_start = (original_width - vertical_width) // 2
         
-        out.release()
-        return True
+        return self._run_loop(cap, fps, original_width, vertical_width, vertical_height,
+                              total_frames, lambda frame, frame_count: x_start)
 
 
 class VerticalVideoCropperGUI(QMainWindow):
@@ -662,16 +807,21 @@ class VerticalVideoCropperGUI(QMainWindow):
                 'min_neighbors': self.neighbors_spin.value(),
                 'min_size': (30, 30),
                 'sample_frames': 30,
-                'right_offset': self.offset_spin.value()
+                'right_offset': self.offset_spin.value(),
+                'detect_every': 5,
+                'detect_width': 480,
+                'yunet_model': os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                            'face_detection_yunet_2023mar.onnx')
             },
             'motion_tracking': {
                 'update_interval': self.interval_spin.value(),
                 'motion_threshold': 2.0,
+                'diff_threshold': 25,
                 'smoothing_factor': self.smoothing_spin.value(),
                 'scale_factor': 0.67
             },
             'output': {
-                'codec': 'mp4v',
+                'codec': 'avc1',
                 'fps': None,
                 'quality': 'medium',
                 'bitrate': '3000k'
@@ -18,14 +18,116 @@
 import cv2
 import numpy as np
 import argparse
+import multiprocessing
 import sys
 import os
+import queue
+import shutil
+import subprocess
+import threading
 from typing import Optional, Tuple, List
 
+try:
+    import numba
+except ImportError:  # numba 为可选依赖，未安装时使用 NumPy 实现
+    numba = None
+
+
+# 人脸检测工作进程各自持有的检测器
+_worker_face_cascade = None
+
+
+def _init_face_worker():
+    """进程池初始化：每个工作进程加载自己的人脸检测器"""
+    global _worker_face_cascade
+    # 并行由进程池提供，进程内不再多线程，避免超额占用CPU
+    cv2.setNumThreads(1)
+    _worker_face_cascade = cv2.CascadeClassifier(
+        cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+    )
+
+
+def _detect_faces_worker(task):
+    """在工作进程中检测一帧缩小后灰度图中的人脸"""
+    small, scale_factor, min_neighbors, min_size = task
+    return _worker_face_cascade.detectMultiScale(
+        small,
+        scaleFactor=scale_factor,
+        minNeighbors=min_neighbors,
+        minSize=min_size
+    )
+
+
+class _FFmpegGrayFrames:
+    """逐帧读取 ffmpeg 子进程输出的亮度平面；close() 结束并回收子进程，可重复调用"""
+    
+    def __init__(self, proc, width, height):
+        self.proc = proc
+        self.width = width
+        self.height = height
+    
+    def __iter__(self):
+        return self
+    
+    def __next__(self) -> np.ndarray:
+        frame_size = self.width * self.height
+        data = self.proc.stdout.read(frame_size)
+        if len(data) < frame_size:
+            raise StopIteration
+        return np.frombuffer(data, dtype=np.uint8).reshape(self.height, self.width)
+    
+    def close(self):
+        # 不论帧是否读完都结束进程，否则 ffmpeg 会阻塞在已满的管道上
+        self.proc.kill()
+        self.proc.stdout.close()
+        self.proc.wait()
+
+
+def _motion_focus(flow, threshold, cols):
+    """按列累加超过阈值的运动幅度，返回加权平均的列坐标；没有显著运动时返回 -1"""
+    # NumPy 下分别求平方、比较再开方要多遍历几次，cv2.magnitude 一遍算完反而更快
+    magnitude = cv2.magnitude(flow[..., 0], flow[..., 1])
+    magnitude[magnitude <= threshold] = 0
+    col_motion = magnitude.sum(axis=0, dtype=np.float32)
+    total_motion = col_motion.sum()
+    if total_motion <= 0:
+        return -1.0
+    return float(np.dot(col_motion, cols) / total_motion)
+
+
+if numba is not None:
+    @numba.njit(cache=True, fastmath=True)
+    def _motion_focus(flow, threshold, cols):
+        """_motion_focus 的 Numba 版本：直接读取光流，一次遍历完成阈值过滤和加权求和"""
+        height, width = flow.shape[:2]
+        threshold_sq = np.float32(threshold * threshold)
+        weighted = 0.0
+        total_motion = 0.0
+        for y in range(height):
+            # 行内用 float32 累加、不分支，便于编译器向量化；跨行再用双精度累加保证精度
+            row_weighted = np.float32(0)
+            row_motion = np.float32(0)
+            for x in range(width):
+                # 用幅度平方与阈值平方比较，不再单独计算整幅幅度图
+                fx = flow[y, x, 0]
+                fy = flow[y, x, 1]
+                m_sq = fx * fx + fy * fy
+                m = np.sqrt(m_sq) if m_sq > threshold_sq else np.float32(0)
+                row_weighted += m * cols[x]
+                row_motion += m
+            weighted += row_weighted
+            total_motion += row_motion
+        if total_motion <= 0:
+            return -1.0
+        return weighted / total_motion
+
 
 class VerticalVideoCropper:
     """智能垂直视频裁剪器"""
     
+    # 写入队列长度；裁剪函数复用输出缓冲区时，至少需要 _WRITE_QUEUE_SIZE + 2 个轮流使用
+    _WRITE_QUEUE_SIZE = 8
+    
     def __init__(self, config: dict = None):
         """
         初始化裁剪器
@@ -40,27 +142,49 @@ class VerticalVideoCropper:
             # 裁剪模式: 'face' | 'motion' | 'center'
             'mode': 'face',
             
+            # 输入参数
+            'input': {
+                'hwaccel': True  # 优先使用硬件解码(NVDEC/QuickSync/VAAPI等)，不支持时回退到软件解码
+            },
+            
             # 人脸检测参数
             'face_detection': {
+                'backend': 'haar',  # 'haar' | 'dnn' (OpenCV res10 SSD，需要模型文件)
+                'dnn_model': os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                          'res10_300x300_ssd_iter_140000.caffemodel'),
+                'dnn_config': os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                           'deploy.prototxt'),
+                'dnn_confidence': 0.5,  # DNN检测置信度阈值
                 'scale_factor': 1.1,
                 'min_neighbors': 8,
                 'min_size': (30, 30),
                 'sample_frames': 30,
-                'right_offset': 60  # 防止右边界裁剪
+                'right_offset': 60,  # 防止右边界裁剪
+                'detect_width': 320,  # 检测时缩小到的宽度(像素)
+                'detect_interval': None,  # 检测间隔(帧)，None表示约每秒检测5次
+                'workers': 1,  # 检测进程数，大于1时先用进程池并行检测再裁剪，None表示使用全部CPU核心
+                'gray_decode': False  # 由 ffmpeg 直接解码缩小后的亮度平面供检测(需要系统安装 ffmpeg，仅Haar检测器)
             },
             
             # 运动跟踪参数
             'motion_tracking': {
                 'update_interval': 1.0,  # 更新间隔(秒)
                 'motion_threshold': 2.0,  # 运动检测阈值
+                'flow_width': 320,  # 计算光流时缩小到的宽度(像素)
                 'smoothing_factor': 0.9,  # 平滑系数(0-1)
                 'scale_factor': 0.67,  # 缩放比例
+                'interpolation': 'area',  # 缩放插值: 'area' | 'linear' | 'cubic' | 'lanczos4'
                 'max_shifts_per_second': 1  # 每秒最大移动次数
             },
             
             # 输出参数
             'output': {
                 'codec': 'mp4v',
+                'use_ffmpeg': False,  # 通过管道交给 ffmpeg 编码(需要系统安装 ffmpeg)
+                'ffmpeg_encoder': 'libx264',  # 'libx264' | 'h264_nvenc'
+                'preset': None,  # 编码预设，None 时 libx264 用 veryfast，h264_nvenc 用 p4
+                'crf': 20,  # 画质参数(h264_nvenc 下作为 -cq)
+                'ffmpeg_center': True,  # 中心裁剪模式直接交给 ffmpeg 裁剪编码(保留音轨)，ffmpeg 不可用时逐帧处理
                 'fps': None,  # 保持原视频FPS
                 'quality': 'medium',  # 输出质量
                 'bitrate': '3000k'
@@ -75,22 +199,37 @@ class VerticalVideoCropper:
             cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
         )
         
+        # OpenCL可用时启用T-API，级联检测和光流可以在GPU上执行
+        self.use_opencl = cv2.ocl.haveOpenCL()
+        if self.use_opencl:
+            cv2.ocl.setUseOpenCL(True)
+        
+        # OpenCV带CUDA模块且有CUDA设备时，运动跟踪在CUDA上转灰度、缩放和计算光流
+        self.use_cuda = (hasattr(cv2, 'cuda_FarnebackOpticalFlow') 
+                         and cv2.cuda.getCudaEnabledDeviceCount() > 0)
+        
+        # 可选的DNN人脸检测器，一次前向推理代替Haar的大量子窗口评估
+        self.face_net = None
+        face_config = self.config['face_detection']
+        if face_config['backend'] == 'dnn':
+            if os.path.exists(face_config['dnn_model']) and os.path.exists(face_config['dnn_config']):
+                self.face_net = cv2.dnn.readNetFromCaffe(face_config['dnn_config'], face_config['dnn_model'])
+            else:
+                print(f"警告: 未找到DNN人脸模型 {face_config['dnn_model']}，改用Haar检测器")
+        
     def _merge_config(self):
         """合并配置参数"""
-        if not self.config:
-            self.config = self.default_config
-            return
-            
-        # 深度合并配置
-        def deep_merge(base, override):
-            for key, value in override.items():
-                if key in base and isinstance(base[key], dict) and isinstance(value, dict):
-                    deep_merge(base[key], value)
-                else:
-                    base[key] = value
+        # 默认配置只有两层：复制每个分区，再用用户配置逐个分区覆盖
+        config = {key: dict(value) if isinstance(value, dict) else value
+                  for key, value in self.default_config.items()}
         
-        deep_merge(self.default_config, self.config)
-        self.config = self.default_config
+        for key, value in self.config.items():
+            if isinstance(value, dict) and isinstance(config.get(key), dict):
+                config[key].update(value)
+            else:
+                config[key] = value
+        
+        self.config = config
     
     def crop_to_vertical(self, input_video_path: str, output_video_path: str) -> bool:
         """
@@ -105,7 +244,7 @@ class VerticalVideoCropper:
         """
         try:
             # 打开视频文件
-            cap = cv2.VideoCapture(input_video_path, cv2.CAP_FFMPEG)
+            cap = self._open_capture(input_video_path)
             if not cap.isOpened():
                 print(f"错误: 无法打开视频文件 {input_video_path}")
                 return False
@@ -140,6 +279,7 @@ class VerticalVideoCropper:
                 return False
             
             # 执行裁剪
+            self._input_video_path = input_video_path
             success = crop_strategy(cap, original_width, original_height, fps, 
                                   vertical_width, vertical_height, output_video_path)
             
@@ -150,6 +290,18 @@ class VerticalVideoCropper:
             print(f"裁剪过程中发生错误: {str(e)}")
             return False
     
+    def _open_capture(self, input_video_path: str):
+        """打开输入视频，按配置请求硬件解码，不支持时回退到软件解码"""
+        if self.config['input']['hwaccel']:
+            # VIDEO_ACCELERATION_ANY 由OpenCV自动选择设备，不能同时指定 CAP_PROP_HW_DEVICE
+            cap = cv2.VideoCapture(input_video_path, cv2.CAP_FFMPEG,
+                                   [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY])
+            if cap.isOpened():
+                if cap.get(cv2.CAP_PROP_HW_ACCELERATION) > 0:
+                    print("解码: 硬件加速")
+                return cap
+        return cv2.VideoCapture(input_video_path, cv2.CAP_FFMPEG)
+    
     def _get_crop_strategy(self, mode: str):
         """获取裁剪策略函数"""
         strategies = {
@@ -169,55 +321,122 @@ class VerticalVideoCropper:
         # 重置视频到开始位置
         cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
         
+        # 在缩小后的灰度图上检测人脸，结果再按比例还原到原始尺寸
+        detect_scale = min(1.0, face_config['detect_width'] / original_width)
+        detect_size = (int(original_width * detect_scale), int(original_height * detect_scale))
+        min_size = tuple(max(1, int(v * detect_scale)) for v in face_config['min_size'])
+        gray = np.empty((original_height, original_width), dtype=np.uint8)
+        small = np.empty((detect_size[1], detect_size[0]), dtype=np.uint8)
+        
+        # 逐帧用到的参数先取到局部变量，避免闭包里反复查字典
+        scale_factor = face_config['scale_factor']
+        min_neighbors = face_config['min_neighbors']
+        right_offset = face_config['right_offset']
+        
+        # 检测间隔(帧)，未指定时约每秒检测5次
+        detect_interval = face_config['detect_interval'] or max(1, int(round(fps / 5)))
+        print(f"人脸检测: 每 {detect_interval} 帧检测一次")
+        
+        if self.face_net is not None:
+            print("人脸检测器: DNN (res10 SSD)")
+        elif self.use_opencl:
+            print("人脸检测器: Haar级联 (OpenCL)")
+        else:
+            print("人脸检测器: Haar级联")
+        
+        # 可选：另开 ffmpeg 进程直接解码出缩小后的亮度平面用于检测，省去转灰度和缩放
+        # (仅用于Haar检测器，DNN需要彩色输入)
+        gray_frames = None
+        if face_config['gray_decode'] and self.face_net is None:
+            gray_frames = self._ffmpeg_gray_frames(self._input_video_path, detect_interval, detect_size)
+        
+        # 多进程时先并行检测出所有采样帧的人脸，再逐帧裁剪
+        # (仅用于Haar检测器，DNN推理本身已是多线程)
+        detections = None
+        workers = face_config['workers'] or os.cpu_count() or 1
+        if workers > 1 and self.face_net is None:
+            try:
+                detections = self._detect_faces_parallel(cap, workers, detect_interval, detect_size, min_size,
+                                                         gray_frames)
+            finally:
+                # 亮度平面已在预检测中读完，之后不再需要 ffmpeg 进程
+                if gray_frames is not None:
+                    gray_frames.close()
+                    gray_frames = None
+        
         # 初始化变量
         current_x = (original_width - vertical_width) // 2  # 默认中心位置
         face_detected = False
         last_face_x = current_x
+        target_x = current_x
         face_count = 0
+        frame_index = 0
+        
+        # 平滑系数转为Q16定点整数，逐帧更新只用整数乘法和移位
+        # (目标位置已限制在有效范围内，加权平均不会越界，无需再次限制)
+        smoothing_q16 = int(0.9 * 65536)
+        # DNN 直接给出原始分辨率的人脸框，级联检测的人脸框是检测尺寸坐标
+        box_scale = 1.0 if self.face_net is not None else detect_scale
         
         def dynamic_face_crop_function(frame):
-            nonlocal current_x, face_detected, last_face_x, face_count
-            
-            # 每帧检测人脸
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            faces = self.face_cascade.detectMultiScale(
-                gray, 
-                scaleFactor=face_config['scale_factor'],
-                minNeighbors=face_config['min_neighbors'],
-                minSize=face_config['min_size']
-            )
-            
-            if len(faces) > 0:
-                # 检测到人脸，选择最大的
-                best_face = max(faces, key=lambda f: f[2] * f[3])
-                x, y, w, h = best_face
-                face_center_x = x + w // 2
-                
-                # 向右偏移防止右边界裁剪
-                face_center_x += face_config['right_offset']
-                
-                if not face_detected:
-                    print(f"✓ 第{face_count}帧开始检测到人脸，切换到动态跟踪")
-                    face_detected = True
-                
-                # 计算目标裁剪位置
-                target_x = max(0, min(face_center_x - vertical_width // 2, original_width - vertical_width))
-                
-                # 平滑移动：90%当前位置 + 10%新位置
-                smoothing_factor = 0.9
-                current_x = int(smoothing_factor * current_x + (1 - smoothing_factor) * target_x)
-                
-                last_face_x = face_center_x
-                face_count += 1
-            else:
-                # 未检测到人脸
-                if face_detected:
-                    # 之前有人脸，短暂保持当前位置
-                    pass
+            nonlocal current_x, face_detected, last_face_x, face_count, frame_index, target_x
+            
+            # 每 detect_interval 帧检测一次人脸
+            detect_now = frame_index % detect_interval == 0
+            frame_index += 1
+            
+            if detect_now:
+                if detections is not None:
+                    detect_index = (frame_index - 1) // detect_interval
+                    faces = detections[detect_index] if detect_index < len(detections) else ()
+                elif self.face_net is not None:
+                    faces = self._detect_faces_dnn(frame)
                 else:
+                    # ffmpeg 输出了缩小后的亮度平面时直接检测
+                    detect_input = next(gray_frames, None) if gray_frames is not None else None
+                    if detect_input is None:
+                        if self.use_opencl:
+                            # 通过UMat在GPU上转灰度、缩放，级联检测也走OpenCL路径
+                            ugray = cv2.cvtColor(cv2.UMat(frame), cv2.COLOR_BGR2GRAY)
+                            detect_input = cv2.resize(ugray, detect_size, interpolation=cv2.INTER_AREA)
+                        else:
+                            cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=gray)
+                            cv2.resize(gray, detect_size, dst=small, interpolation=cv2.INTER_AREA)
+                            detect_input = small
+                    faces = self.face_cascade.detectMultiScale(
+                        detect_input, 
+                        scaleFactor=scale_factor,
+                        minNeighbors=min_neighbors,
+                        minSize=min_size
+                    )
+                
+                if len(faces) > 0:
+                    # 检测到人脸，选择最大的
+                    best_face = max(faces, key=lambda f: f[2] * f[3])
+                    x, y, w, h = best_face
+                    face_center_x = int((x + w / 2) / box_scale)
+                    
+                    # 向右偏移防止右边界裁剪
+                    face_center_x += right_offset
+                    
+                    if not face_detected:
+                        print(f"✓ 第{frame_index - 1}帧开始检测到人脸，切换到动态跟踪")
+                        face_detected = True
+                    
+                    # 计算目标裁剪位置
+                    target_x = max(0, min(face_center_x - vertical_width // 2, original_width - vertical_width))
+                    
+                    last_face_x = face_center_x
+                    face_count += 1
+                elif not face_detected:
                     # 一直没有人脸，使用中心位置
                     current_x = (original_width - vertical_width) // 2
             
+            # 平滑移动：90%当前位置 + 10%新位置
+            # 两次检测之间沿用最近的目标位置；之前有人脸但暂时丢失时，同样保持向该位置移动
+            if face_detected:
+                current_x = (current_x * smoothing_q16 + target_x * (65536 - smoothing_q16)) >> 16
+            
             # 裁剪当前帧
             crop_x_start = int(current_x)
             crop_x_end = min(crop_x_start + vertical_width, original_width)
@@ -229,17 +448,101 @@ class VerticalVideoCropper:
             return frame[:, crop_x_start:crop_x_end]
         
         # 执行裁剪
-        success = self._write_cropped_video(cap, vertical_width, vertical_height, fps, 
-                                          output_path, dynamic_face_crop_function)
+        try:
+            success = self._write_cropped_video(cap, vertical_width, vertical_height, fps, 
+                                              output_path, dynamic_face_crop_function)
+        finally:
+            if gray_frames is not None:
+                gray_frames.close()
         
         # 输出统计信息
         if face_count > 0:
-            print(f"✓ 成功跟踪了 {face_count} 帧中的人脸")
+            # 只有检测帧会计数，检测帧之间沿用上次的结果
+            print(f"✓ 共 {face_count} 个检测帧检测到人脸 (每 {detect_interval} 帧检测一次)")
         else:
             print("✗ 整个视频中未检测到人脸，使用中心裁剪")
         
         return success
     
+    def _detect_faces_dnn(self, frame) -> np.ndarray:
+        """用DNN检测人脸，返回置信度最高的人脸框(原始分辨率坐标)，未检测到时为空"""
+        blob = cv2.dnn.blobFromImage(frame, 1.0, (300, 300), (104.0, 177.0, 123.0))
+        self.face_net.setInput(blob)
+        detections = self.face_net.forward()[0, 0]  # 每行: [_, _, 置信度, x1, y1, x2, y2] (归一化坐标)
+        
+        if len(detections) == 0:
+            return np.empty((0, 4), dtype=np.float32)
+        
+        best = detections[np.argmax(detections[:, 2])]
+        if best[2] < self.config['face_detection']['dnn_confidence']:
+            return np.empty((0, 4), dtype=np.float32)
+        
+        # 归一化坐标直接换算到原始分辨率，不经过检测尺寸的取整，避免放大后丢失精度
+        height, width = frame.shape[:2]
+        x1, y1, x2, y2 = best[3:7]
+        return np.array([[x1 * width, y1 * height,
+                          (x2 - x1) * width, (y2 - y1) * height]], dtype=np.float32)
+    
+    def _ffmpeg_gray_frames(self, input_video_path, detect_interval, detect_size):
+        """用 ffmpeg 解码出每 detect_interval 帧中一帧的缩小亮度平面，返回 _FFmpegGrayFrames；不可用时返回 None"""
+        ffmpeg = shutil.which('ffmpeg')
+        if not ffmpeg:
+            print("警告: 未找到 ffmpeg，检测帧改为逐帧转换灰度")
+            return None
+        
+        width, height = detect_size
+        cmd = [
+            ffmpeg, '-nostdin', '-loglevel', 'error', '-i', input_video_path,
+            '-vf', f'select=not(mod(n\\,{detect_interval})),scale={width}:{height}:flags=area',
+            '-vsync', '0', '-an',
+            '-f', 'rawvideo', '-pix_fmt', 'gray', '-'
+        ]
+        
+        # 子进程不读终端输入，后台运行时不会因 SIGTTIN 被挂起
+        try:
+            proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, bufsize=1 << 20)
+        except OSError as e:
+            print(f"警告: 启动 ffmpeg 失败({e})，检测帧改为逐帧转换灰度")
+            return None
+        
+        print("人脸检测: 由 ffmpeg 直接解码亮度平面")
+        return _FFmpegGrayFrames(proc, width, height)
+    
+    def _detect_faces_parallel(self, cap, workers, detect_interval, detect_size, min_size,
+                               gray_frames=None) -> list:
+        """第一遍：读取每个采样帧，交给进程池检测人脸，按帧顺序返回检测结果"""
+        face_config = self.config['face_detection']
+        print(f"使用 {workers} 个进程并行检测人脸...")
+        
+        # 已有 ffmpeg 输出的亮度平面时无需读取 cap，也就不用回到开头
+        if gray_frames is not None:
+            tasks = ((small, face_config['scale_factor'], face_config['min_neighbors'], min_size)
+                     for small in gray_frames)
+            with multiprocessing.Pool(workers, initializer=_init_face_worker) as pool:
+                return list(pool.imap(_detect_faces_worker, tasks, chunksize=4))
+        
+        def sampled_frames():
+            # 缩小后的图会交给进程池异步发送，每帧单独分配；全尺寸灰度图可以复用
+            gray = None
+            frame_index = 0
+            while True:
+                if frame_index % detect_interval == 0:
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=gray)
+                    small = cv2.resize(gray, detect_size, interpolation=cv2.INTER_AREA)
+                    yield small, face_config['scale_factor'], face_config['min_neighbors'], min_size
+                elif not cap.grab():
+                    # 非采样帧只解码不取出图像
+                    break
+                frame_index += 1
+        
+        with multiprocessing.Pool(workers, initializer=_init_face_worker) as pool:
+            detections = list(pool.imap(_detect_faces_worker, sampled_frames(), chunksize=4))
+        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        return detections
+    
     def _crop_with_motion_tracking(self, cap, original_width, original_height, fps,
                                   vertical_width, vertical_height, output_path) -> bool:
         """运动跟踪裁剪模式"""
@@ -262,6 +565,18 @@ class VerticalVideoCropper:
         print(f"缩放视频: {original_width}x{original_height} → {scaled_width}x{scaled_height}")
         print(f"显示区域: {vertical_width}px 宽 (从 {scaled_width}px 缩放帧中)")
         
+        # 缩小时 INTER_AREA 又快又不失真，LANCZOS4 的8抽头卷积慢得多
+        interpolations = {
+            'area': cv2.INTER_AREA,
+            'linear': cv2.INTER_LINEAR,
+            'cubic': cv2.INTER_CUBIC,
+            'lanczos4': cv2.INTER_LANCZOS4
+        }
+        interpolation = interpolations.get(motion_config['interpolation'])
+        if interpolation is None:
+            print(f"警告: 不支持的插值方式 '{motion_config['interpolation']}'，使用 area")
+            interpolation = cv2.INTER_AREA
+        
         # 计算更新间隔
         update_interval = max(1, int(fps * motion_config['update_interval']))
         print(f"运动跟踪: 每 {update_interval} 帧更新 (~{motion_config['update_interval']}秒)")
@@ -269,43 +584,86 @@ class VerticalVideoCropper:
         # 重置视频到开始位置
         cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
         
+        # 光流只用于得到列方向的运动分布，在缩小的灰度图上计算即可
+        # 阈值按缩小比例换算，使其仍以缩放帧的像素为单位
+        flow_scale = min(1.0, motion_config['flow_width'] / scaled_width)
+        flow_size = (int(scaled_width * flow_scale), int(scaled_height * flow_scale))
+        motion_threshold = motion_config['motion_threshold'] * flow_scale
+        dis = cv2.DISOpticalFlow_create(cv2.DISOPTICAL_FLOW_PRESET_FAST)
+        
+        # CUDA模块没有DIS，改用参数较粗的Farneback (2层金字塔, 11x11窗口, 1次迭代)
+        if self.use_cuda:
+            print("运动跟踪: 使用CUDA计算光流")
+            cuda_flow = cv2.cuda_FarnebackOpticalFlow.create(2, 0.5, False, 11, 1)
+            gpu_frame = cv2.cuda_GpuMat()
+        
+        # 预分配缓冲区，避免每帧分配内存
+        # 输出帧交给写入线程异步编码，因此轮流使用多个缓冲区，保证写完前不被覆盖
+        ring_size = self._WRITE_QUEUE_SIZE + 2
+        
+        # 缩放后高度不足时上下加黑边：画布只清零一次，之后每帧只覆盖中间的画面带；
+        # 此时输出的是画布，缩放帧只需一个缓冲区
+        need_canvas = scaled_height < vertical_height
+        offset_y = (vertical_height - scaled_height) // 2
+        canvases = [np.zeros((vertical_height, vertical_width, 3), dtype=np.uint8)
+                    for _ in range(ring_size if need_canvas else 0)]
+        resized_bufs = [np.empty((scaled_height, scaled_width, 3), dtype=np.uint8)
+                        for _ in range(1 if need_canvas else ring_size)]
+        buf_index = 0
+        gray = np.empty((scaled_height, scaled_width), dtype=np.uint8)
+        flow_grays = [np.empty((flow_size[1], flow_size[0]), dtype=np.uint8) for _ in range(2)]
+        
         smoothed_x = 0
         prev_gray = None
+        frame_count = 0
+        smoothing_q16 = int(motion_config['smoothing_factor'] * 65536)  # Q16定点平滑系数
+        cols = np.arange(flow_size[0], dtype=np.float32)  # 列坐标，用于加权求运动焦点
         
         def motion_crop_function(frame):
-            nonlocal smoothed_x, prev_gray
+            nonlocal smoothed_x, prev_gray, buf_index, frame_count
             
             # 缩放帧
-            resized_frame = cv2.resize(frame, (scaled_width, scaled_height), 
-                                     interpolation=cv2.INTER_LANCOS4)
+            resized_frame = resized_bufs[buf_index % len(resized_bufs)]
+            cv2.resize(frame, (scaled_width, scaled_height), dst=resized_frame,
+                       interpolation=interpolation)
             
-            # 运动跟踪逻辑
-            frame_count = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+            # 运动跟踪逻辑：本地计数已读取的帧数(帧由读取线程提前解码，不能再查询 cap 的位置)
+            frame_count += 1
             
             if frame_count % update_interval == 0:
-                curr_gray = cv2.cvtColor(resized_frame, cv2.COLOR_BGR2GRAY)
+                if self.use_cuda:
+                    # 上传缩放帧，转灰度、缩小和光流都留在显存中，只下载光流结果
+                    gpu_frame.upload(resized_frame)
+                    gpu_gray = cv2.cuda.cvtColor(gpu_frame, cv2.COLOR_BGR2GRAY)
+                    curr_gray = cv2.cuda.resize(gpu_gray, flow_size, interpolation=cv2.INTER_AREA)
+                elif self.use_opencl:
+                    # 通过UMat在GPU上转灰度、缩放和计算光流，只取回光流结果
+                    ugray = cv2.cvtColor(cv2.UMat(resized_frame), cv2.COLOR_BGR2GRAY)
+                    curr_gray = cv2.resize(ugray, flow_size, interpolation=cv2.INTER_AREA)
+                else:
+                    # 两个缓冲区交替作为前一帧和当前帧
+                    curr_gray = flow_grays[1] if prev_gray is flow_grays[0] else flow_grays[0]
+                    cv2.cvtColor(resized_frame, cv2.COLOR_BGR2GRAY, dst=gray)
+                    cv2.resize(gray, flow_size, dst=curr_gray, interpolation=cv2.INTER_AREA)
                 
                 if prev_gray is not None:
-                    # 计算光流
-                    flow = cv2.calcOpticalFlowFarneback(
-                        prev_gray, curr_gray, None, 0.5, 3, 15, 3, 5, 1.2, 0
-                    )
-                    magnitude = np.sqrt(flow[..., 0]**2 + flow[..., 1]**2)
+                    # 计算光流(CPU/OpenCL 使用DIS，比Farneback快得多)
+                    if self.use_cuda:
+                        flow = cuda_flow.calc(prev_gray, curr_gray, None).download()
+                    elif self.use_opencl:
+                        flow = dis.calc(prev_gray, curr_gray, None).get()
+                    else:
+                        flow = dis.calc(prev_gray, curr_gray, None)
                     
-                    # 检测显著运动
-                    significant_motion = magnitude > motion_config['motion_threshold']
+                    # 只保留显著运动，按运动权重计算焦点位置
+                    focus_x = _motion_focus(flow, motion_threshold, cols)
                     
-                    if np.any(significant_motion):
-                        # 按运动权重计算焦点位置
-                        col_motion = np.sum(magnitude * significant_motion, axis=0)
+                    if focus_x >= 0:
+                        motion_x = int(focus_x / flow_scale)
+                        target_x = max(0, min(motion_x - vertical_width // 2, scaled_width - vertical_width))
                         
-                        if np.sum(col_motion) > 0:
-                            motion_x = int(np.average(np.arange(scaled_width), weights=col_motion))
-                            target_x = max(0, min(motion_x - vertical_width // 2, scaled_width - vertical_width))
-                            
-                            # 平滑移动
-                            smoothing = motion_config['smoothing_factor']
-                            smoothed_x = int(smoothing * smoothed_x + (1 - smoothing) * target_x)
+                        # 平滑移动
+                        smoothed_x = (smoothed_x * smoothing_q16 + target_x * (65536 - smoothing_q16)) >> 16
                 
                 prev_gray = curr_gray
             
@@ -320,14 +678,14 @@ class VerticalVideoCropper:
             cropped_frame = resized_frame[:, crop_x_start:crop_x_end]
             
             # 处理高度适配
-            if scaled_height < vertical_height:
-                canvas = np.zeros((vertical_height, vertical_width, 3), dtype=np.uint8)
-                offset_y = (vertical_height - scaled_height) // 2
+            if need_canvas:
+                canvas = canvases[buf_index % ring_size]
                 canvas[offset_y:offset_y+scaled_height, :] = cropped_frame
                 cropped_frame = canvas
             elif scaled_height > vertical_height:
                 cropped_frame = cropped_frame[:vertical_height, :]
             
+            buf_index += 1
             return cropped_frame
         
         return self._write_cropped_video(cap, vertical_width, vertical_height, fps,
@@ -341,30 +699,135 @@ class VerticalVideoCropper:
         x_start = (original_width - vertical_width) // 2
         print(f"中心裁剪位置: x={x_start}")
         
+        # 中心裁剪不需要逐帧的Python处理，优先由 ffmpeg 的 crop 滤镜完成
+        if self.config['output']['ffmpeg_center'] and \
+                self._crop_center_ffmpeg(x_start, vertical_width, vertical_height, output_path):
+            return True
+        
         # 重置视频到开始位置
         cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
         
         return self._write_cropped_video(cap, vertical_width, vertical_height, fps,
                                        output_path, lambda frame: frame[:, x_start:x_start+vertical_width])
     
+    def _crop_center_ffmpeg(self, x_start, width, height, output_path) -> bool:
+        """由 ffmpeg 直接完成中心裁剪和编码；ffmpeg 不可用或失败时返回 False"""
+        ffmpeg = shutil.which('ffmpeg')
+        if not ffmpeg:
+            return False
+        
+        cmd = [
+            ffmpeg, '-y', '-nostdin', '-loglevel', 'error', '-i', self._input_video_path,
+            # yuv420p 要求宽高为偶数，奇数时少裁一列/行
+            '-vf', f'crop={width - width % 2}:{height - height % 2}:{x_start}:0',
+            *self._ffmpeg_encode_args(),
+            '-c:a', 'copy',
+            output_path
+        ]
+        
+        print("使用 ffmpeg 直接裁剪...")
+        try:
+            # 不继承终端输入：ffmpeg 不会吞掉按键，后台运行时也不会因 SIGTTIN 被挂起
+            result = subprocess.run(cmd, stdin=subprocess.DEVNULL)
+        except OSError as e:
+            print(f"警告: 启动 ffmpeg 失败({e})，改用逐帧裁剪")
+            return False
+        
+        if result.returncode != 0:
+            print(f"警告: ffmpeg 裁剪失败 (返回码 {result.returncode})，改用逐帧裁剪")
+            return False
+        
+        print(f"✓ 裁剪完成 -> {output_path}")
+        return True
+    
+    def _ffmpeg_encode_args(self) -> list:
+        """按输出配置生成 ffmpeg 视频编码参数"""
+        output_config = self.config['output']
+        encoder = output_config['ffmpeg_encoder']
+        nvenc = encoder.endswith('_nvenc')
+        preset = output_config['preset'] or ('p4' if nvenc else 'veryfast')
+        return [
+            '-c:v', encoder, '-preset', preset,
+            '-cq' if nvenc else '-crf', str(output_config['crf']),
+            '-pix_fmt', 'yuv420p'
+        ]
+    
+    def _open_ffmpeg_pipe(self, width, height, fps, output_path):
+        """启动 ffmpeg 子进程，通过 stdin 接收 bgr24 原始帧；不可用时返回 None"""
+        ffmpeg = shutil.which('ffmpeg')
+        if not ffmpeg:
+            print("警告: 未找到 ffmpeg，改用 OpenCV VideoWriter 输出")
+            return None
+        
+        cmd = [
+            ffmpeg, '-y', '-loglevel', 'error',
+            '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f'{width}x{height}', '-r', str(fps),
+            '-i', '-',
+            # yuv420p 要求宽高为偶数，奇数时裁掉最后一列/行
+            '-vf', 'crop=trunc(iw/2)*2:trunc(ih/2)*2',
+            *self._ffmpeg_encode_args(),
+            output_path
+        ]
+        
+        try:
+            # 较大的管道缓冲，避免逐帧写入时频繁阻塞
+            return subprocess.Popen(cmd, stdin=subprocess.PIPE, bufsize=1 << 20)
+        except OSError as e:
+            print(f"警告: 启动 ffmpeg 失败({e})，改用 OpenCV VideoWriter 输出")
+            return None
+    
     def _write_cropped_video(self, cap, width, height, fps, output_path, crop_function) -> bool:
         """写入裁剪后的视频"""
         try:
-            fourcc = cv2.VideoWriter_fourcc(*self.config['output']['codec'])
-            out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
-            
-            if not out.isOpened():
-                print(f"错误: 无法创建输出视频文件 {output_path}")
-                return False
+            proc = None
+            if self.config['output']['use_ffmpeg']:
+                proc = self._open_ffmpeg_pipe(width, height, fps, output_path)
+            
+            out_bufs = None
+            if proc is not None:
+                print(f"使用 ffmpeg 编码器: {self.config['output']['ffmpeg_encoder']}")
+                # 管道写入需要连续内存：非连续的裁剪视图先复制到预分配的输出缓冲区，
+                # 再直接写出缓冲区的内存视图，不再逐帧 tobytes() 分配新对象。
+                # 缓冲区轮流使用：写入队列中最多 _WRITE_QUEUE_SIZE 帧，写入线程手上还有1帧
+                out_bufs = [np.empty((height, width, 3), dtype=np.uint8)
+                            for _ in range(self._WRITE_QUEUE_SIZE + 2)]
+                out_index = 0
+                write_frame = lambda f: proc.stdin.write(f.data)
+            else:
+                # VideoWriter 内部会自行复制，裁剪视图直接传入即可
+                fourcc = cv2.VideoWriter_fourcc(*self.config['output']['codec'])
+                out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+                
+                if not out.isOpened():
+                    print(f"错误: 无法创建输出视频文件 {output_path}")
+                    return False
+                write_frame = out.write
             
             frame_count = 0
             total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
             
             print(f"开始处理 {total_frames} 帧...")
             
-            while True:
-                ret, frame = cap.read()
-                if not ret:
+            # 解码、裁剪、编码三者并行：读取线程解码，主线程裁剪，写入线程编码
+            # 有界队列提供背压，内存占用保持恒定
+            read_queue = queue.Queue(maxsize=8)
+            write_queue = queue.Queue(maxsize=self._WRITE_QUEUE_SIZE)
+            write_failed = threading.Event()
+            stop_reading = threading.Event()
+            reader = threading.Thread(target=self._reader_loop, args=(cap, read_queue, stop_reading),
+                                      daemon=True)
+            writer = threading.Thread(target=self._writer_loop, 
+                                      args=(write_frame, write_queue, write_failed), daemon=True)
+            reader.start()
+            writer.start()
+            
+            # 内置裁剪函数输出的尺寸和格式总是正确的，只检查第一帧；
+            # 不一致时才对之后的每一帧做转换
+            needs_conversion = None
+            
+            while not write_failed.is_set():
+                frame = read_queue.get()
+                if frame is None:
                     break
                 
                 # 应用裁剪函数
@@ -375,21 +838,23 @@ class VerticalVideoCropper:
                     if cropped_frame is None or cropped_frame.shape[0] == 0 or cropped_frame.shape[1] == 0:
                         print(f"警告: 第 {frame_count} 帧裁剪后尺寸异常")
                         continue
-                        
-                    # 确保帧尺寸与输出设置一致
-                    if cropped_frame.shape[0] != height or cropped_frame.shape[1] != width:
-                        cropped_frame = cv2.resize(cropped_frame, (width, height))
-                        
-                    # 检查数据类型和通道数
-                    if cropped_frame.dtype != np.uint8:
-                        cropped_frame = cropped_frame.astype(np.uint8)
-                        
-                    if len(cropped_frame.shape) == 2:  # 灰度图
-                        cropped_frame = cv2.cvtColor(cropped_frame, cv2.COLOR_GRAY2BGR)
-                    elif cropped_frame.shape[2] == 4:  # RGBA转RGB
-                        cropped_frame = cropped_frame[:, :, :3]
-                        
-                    out.write(cropped_frame)
+                    
+                    if needs_conversion is None:
+                        needs_conversion = (cropped_frame.shape != (height, width, 3) 
+                                            or cropped_frame.dtype != np.uint8)
+                        if needs_conversion:
+                            print(f"警告: 裁剪输出 {cropped_frame.shape} {cropped_frame.dtype} 与目标不一致，将逐帧转换")
+                    
+                    if needs_conversion:
+                        cropped_frame = self._conform_frame(cropped_frame, width, height)
+                    
+                    if out_bufs is not None and not cropped_frame.flags.c_contiguous:
+                        out_buf = out_bufs[out_index]
+                        out_index = (out_index + 1) % len(out_bufs)
+                        np.copyto(out_buf, cropped_frame)
+                        cropped_frame = out_buf
+                    
+                    write_queue.put(cropped_frame)
                     frame_count += 1
                     
                     if frame_count % 100 == 0:
@@ -399,7 +864,30 @@ class VerticalVideoCropper:
                     print(f"警告: 处理第 {frame_count} 帧时出错: {frame_error}")
                     continue
             
-            out.release()
+            # 提前结束时（如写入失败）通知读取线程不再解码；
+            # 它最多阻塞在一次放入已满队列的操作上，取走剩余帧即可使其退出
+            stop_reading.set()
+            while reader.is_alive():
+                try:
+                    read_queue.get_nowait()
+                except queue.Empty:
+                    reader.join(0.05)
+            write_queue.put(None)
+            writer.join()
+            
+            if proc is not None:
+                try:
+                    proc.stdin.close()
+                except OSError:
+                    write_failed.set()
+                returncode = proc.wait()
+                if write_failed.is_set() or returncode != 0:
+                    print(f"错误: ffmpeg 编码失败 (返回码 {returncode})")
+                    return False
+            else:
+                out.release()
+                if write_failed.is_set():
+                    return False
             print(f"✓ 裁剪完成: 处理了 {frame_count} 帧 -> {output_path}")
             return True
             
@@ -407,11 +895,58 @@ class VerticalVideoCropper:
             print(f"写入视频时发生错误: {str(e)}")
             # 尝试释放资源
             try:
+                if locals().get('stop_reading') is not None:
+                    stop_reading.set()
                 if 'out' in locals():
                     out.release()
+                if locals().get('proc') is not None:
+                    proc.kill()
             except:
                 pass
             return False
+    
+    def _conform_frame(self, cropped_frame, width, height) -> np.ndarray:
+        """将裁剪结果转换为输出要求的尺寸、数据类型和通道数"""
+        # 确保帧尺寸与输出设置一致
+        if cropped_frame.shape[0] != height or cropped_frame.shape[1] != width:
+            cropped_frame = cv2.resize(cropped_frame, (width, height))
+            
+        # 检查数据类型和通道数
+        if cropped_frame.dtype != np.uint8:
+            cropped_frame = cropped_frame.astype(np.uint8)
+            
+        if len(cropped_frame.shape) == 2:  # 灰度图
+            cropped_frame = cv2.cvtColor(cropped_frame, cv2.COLOR_GRAY2BGR)
+        elif cropped_frame.shape[2] == 4:  # RGBA转RGB
+            cropped_frame = cropped_frame[:, :, :3]
+        
+        return cropped_frame
+    
+    def _reader_loop(self, cap, read_queue, stop_reading):
+        """读取线程：解码视频帧，读完或收到停止通知时放入None作为结束标记"""
+        while not stop_reading.is_set():
+            ret, frame = cap.read()
+            if not ret:
+                break
+            read_queue.put(frame)
+        read_queue.put(None)
+    
+    def _writer_loop(self, write_frame, write_queue, write_failed):
+        """写入线程：按顺序编码写入裁剪后的帧，收到None时退出"""
+        while True:
+            frame = write_queue.get()
+            if frame is None:
+                break
+            if write_failed.is_set():
+                # 写入已失败，只取走剩余帧避免主线程阻塞
+                continue
+            try:
+                write_frame(frame)
+            except Exception as e:
+                # ffmpeg 退出后写管道在 Linux 上为 BrokenPipeError，Windows 上可能是 OSError(EINVAL)；
+                # 任何异常都不能让写入线程退出，否则主线程会阻塞在已满的写入队列上
+                print(f"错误: 写入视频帧失败: {str(e)}")
+                write_failed.set()
 
 
 def main():